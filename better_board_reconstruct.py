@@ -1,5 +1,12 @@
+import heapq
 import json
-from collections import defaultdict
+import mmap
+import os
+import struct
+from collections import defaultdict, deque
+from functools import lru_cache
+
+import numpy as np
 
 # --- EDIT THESE TWO PATHS ---
 PATHS_FILE = "/path/to/word_paths.json" 
@@ -8,17 +15,59 @@ DICT_FILE  = "/path/to/dictionary.txt"
 
 ALL = (1 << 26) - 1  # 26-letter domain bitmask
 
+# Candidate sets at most this large are scanned bit by bit, not gathered
+SPARSE_CANDS = 16
+# ... and sets of at most m / GATHER_DIVISOR words gather letters by word ID
+# (the compiled kernel scans every set up to this size bit by bit)
+GATHER_DIVISOR = 16
+
+# The branching heap is rebuilt once stale entries make it this many times
+# larger than the number of paths
+HEAP_SLACK = 8
+
+# Failed search states remembered before the oldest are forgotten
+FAILED_LIMIT = 100_000
+
+# Shared path candidate sets kept before the pool is flushed
+POOL_LIMIT = 4096
+
+# Cached letter-set bitsets kept per (length, position) before flushing
+CACHE_LIMIT = 256
+
+# BYTE_LETTERS[b] = positions of the 1-bits in byte b
+BYTE_LETTERS = [tuple(i for i in range(8) if b >> i & 1) for b in range(256)]
+
 
 def iter_bits(x):
-    """Yield indices of 1-bits in x."""
+    """Yield indices of 1-bits in x, a byte at a time (meant for domain masks)."""
+    shift = 0
     while x:
-        lsb = x & -x
-        yield lsb.bit_length() - 1
-        x ^= lsb
+        for i in BYTE_LETTERS[x & 0xFF]:
+            yield shift + i
+        x >>= 8
+        shift += 8
+
+
+def iter_word_ids(words):
+    """Yield indices of 1-bits in a uint64 word array."""
+    for wi in np.flatnonzero(words):
+        x = int(words[wi])
+        base = int(wi) << 6
+        while x:
+            lsb = x & -x
+            yield base + lsb.bit_length() - 1
+            x ^= lsb
+
+
+def popcount(words):
+    """Number of 1-bits in a uint64 word array."""
+    return int(np.bitwise_count(words).sum())
 
 
-def bitcount(x):
-    return x.bit_count() if hasattr(int, "bit_count") else bin(x).count("1")
+@lru_cache(maxsize=None)
+def mask_letters(mask):
+    """Letter indices of a domain bitmask, as an index array."""
+    return np.fromiter(iter_bits(mask), dtype=np.intp)
 
 
 def load_paths():
@@ -47,189 +96,386 @@ def load_dictionary(max_len):
     """words_by_len[L] = [WORD, WORD, ...] (uppercased)."""
     words_by_len = defaultdict(list)
 
-    with open(DICT_FILE, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            w = line.strip()
-            if not w or not w.isalpha():
-                continue
-            w = w.upper()
-            L = len(w)
-            if 1 <= L <= max_len:
-                words_by_len[L].append(w)
+    with open(DICT_FILE, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return words_by_len  # mmap cannot map an empty file
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            text = data[:].decode("utf-8", "ignore")
+
+    lines = map(str.strip, text.upper().splitlines())
+    for w in [w for w in lines if w.isalpha() and len(w) <= max_len]:
+        words_by_len[len(w)].append(w)
 
     return words_by_len
 
 
+class PosTable:
+    """Word-bitsets for one (length, position), plus ORed letter sets by mask."""
+
+    __slots__ = ("letter_bits", "cache")
+
+    def __init__(self, letter_bits):
+        self.letter_bits = letter_bits
+        self.cache = {}
+
+    def __getitem__(self, letter):
+        return self.letter_bits[letter]
+
+    def allowed_words(self, allowed):
+        """Cached allowed_words_for_pos for this position."""
+        out = self.cache.get(allowed)
+        if out is None:
+            if len(self.cache) >= CACHE_LIMIT:
+                self.cache.clear()
+            out = allowed_words_for_pos(self.letter_bits, allowed)
+            self.cache[allowed] = out
+        return out
+
+
 def build_index(words_by_len):
     """
     index[L][pos][letter] = bitset of word IDs with that letter at that position
     all_mask[L] = bitset with all word IDs for that length
+    letter_of_word[L][pos][wid] = letter index of word wid at that position
+
+    Bitsets are uint64 word arrays of length ceil(m / 64); word ID wid lives
+    at bit (wid & 63) of word (wid >> 6).
     """
     index = {}
     all_mask = {}
+    letter_of_word = {}
 
     for L, words in words_by_len.items():
         m = len(words)
         if m == 0:
             continue
 
-        all_mask[L] = (1 << m) - 1
-        pos_tables = []
+        nwords = (m + 63) // 64
+        full = np.full(nwords, np.iinfo(np.uint64).max, dtype=np.uint64)
+        if m & 63:
+            full[-1] = (1 << (m & 63)) - 1
+        all_mask[L] = full
+
+        # Non-ASCII letters encode as "?" and wrap outside 0..25 here
+        raw = b"".join(w.encode("ascii", "replace") for w in words)
+        lw = np.frombuffer(raw, dtype=np.uint8).reshape(m, L).T - 65
+        letter_of_word[L] = lw
+
+        pos_tables = np.zeros((L, 26, nwords), dtype=np.uint64)
+        wids = np.arange(m)
+        bits = np.uint64(1) << (wids & 63).astype(np.uint64)
 
         for pos in range(L):
-            letter_bits = [0] * 26
-            for wid, w in enumerate(words):
-                li = ord(w[pos]) - 65
-                if 0 <= li < 26:
-                    letter_bits[li] |= (1 << wid)
-            pos_tables.append(letter_bits)
+            li = lw[pos]
+            ok = li < 26
+            np.bitwise_or.at(pos_tables[pos], (li[ok], wids[ok] >> 6), bits[ok])
 
-        index[L] = pos_tables
+        index[L] = [PosTable(letter_bits) for letter_bits in pos_tables]
 
-    return index, all_mask
+    return index, all_mask, letter_of_word
 
 
-def allowed_words_for_pos(index_pos, allowed_letters_mask):
+def allowed_words_for_pos(letter_bits, allowed_letters_mask):
     """OR together word-bitsets for all allowed letters at one position."""
-    out = 0
-    m = allowed_letters_mask
-    while m:
-        lsb = m & -m
-        letter = lsb.bit_length() - 1
-        out |= index_pos[letter]
-        m ^= lsb
-    return out
+    return np.bitwise_or.reduce(letter_bits[mask_letters(allowed_letters_mask)], axis=0)
 
 
 def compute_path_candidates(path_cells, L, domains, index, all_mask):
-    """Return bitset of candidate word IDs for this path."""
+    """Return bitset of candidate word IDs for this path, or None if empty."""
     if L not in index:
-        return 0
+        return None
 
-    cand = all_mask[L]
+    cand = all_mask[L].copy()
     idxL = index[L]
 
     for pos, cell in enumerate(path_cells):
-        allowed = domains[cell]
-        if allowed == 0:
-            return 0
-        cand &= allowed_words_for_pos(idxL[pos], allowed)
-        if cand == 0:
-            return 0
+        np.bitwise_and(cand, idxL[pos].allowed_words(domains[cell]), out=cand)
+        if not cand.any():
+            return None
 
     return cand
 
 
-def possible_letters_at_pos(cands, index_pos):
-    """Which letters appear among candidate words at this (length,pos)?"""
-    mask = 0
-    for letter in range(26):
-        if cands & index_pos[letter]:
-            mask |= (1 << letter)
-    return mask
+def recompute_paths(pids, paths, domains, path_keys, pool, index, all_mask):
+    """
+    Yield (pid, key, compute_path_candidates(...)) for each pid whose cell
+    domains differ from path_keys[pid]. Paths are computed lazily, so a
+    caller that stops at the first None skips the rest.
+
+    Paths of the same length whose cells have the same domains have the
+    same candidates, so results are pooled by (L, key) and shared as
+    read-only arrays rather than computed and stored once per path. Each
+    result is computed from key alone, never from the live domains, so
+    it always matches the entry it is stored under.
+    """
+    for pid in pids:
+        cells, L = paths[pid]
+        key = tuple([domains[cell] for cell in cells])
+        if key == path_keys[pid]:
+            continue  # none of its cells changed
+
+        pc = pool.get((L, key), pool)  # the pool itself marks a miss
+        if pc is pool:
+            pc = compute_path_candidates(range(L), L, key, index, all_mask)
+            if pc is not None:
+                pc.flags.writeable = False
+            if len(pool) >= POOL_LIMIT:
+                pool.clear()
+            pool[(L, key)] = pc
+        yield pid, key, pc
+
+
+def possible_letters_by_pos(cands, idxL, letters, gather_divisor):
+    """Which letters appear among candidate words at each position of length L?"""
+    m = letters.shape[1]
+    count = popcount(cands)
+
+    if count <= SPARSE_CANDS:
+        masks = [0] * len(letters)
+        for wid in iter_word_ids(cands):
+            for pos, li in enumerate(letters[:, wid].tolist()):
+                if li < 26:
+                    masks[pos] |= 1 << li
+        return masks
+
+    if count <= m // gather_divisor:
+        # Gather every candidate's letters at once
+        wids = np.flatnonzero(np.unpackbits(cands.view(np.uint8), count=m, bitorder="little"))
+        bits = np.left_shift(1, letters[:, wids], dtype=np.int64)
+        return np.bitwise_or.reduce(bits, axis=1).tolist()
+
+    # Dense: test each letter's word-bitset against the candidates
+    masks = []
+    for table in idxL:
+        hits = np.bitwise_and(table.letter_bits, cands).any(axis=1)
+        masks.append(int.from_bytes(np.packbits(hits, bitorder="little").tobytes(), "little"))
+    return masks
+
+
+# Compiled kernels (see bitset_ops.pyx) replace the pure-Python versions
+# above when the extension has been built.
+try:
+    from bitset_ops import compute_path_candidates, iter_word_ids, popcount, possible_letters_by_pos
+    HAVE_KERNELS = True
+except ImportError:
+    HAVE_KERNELS = False
+
+
+class SearchState:
+    """
+    Cell domains and path candidate sets shared by the whole search.
+
+    Every write goes through set_domain / set_pc, which record the old value
+    on a trail so that undo(mark) can restore the state when backtracking.
+    n_singletons counts the cells down to one letter and is kept up to date
+    by the same writes.
+    path_keys[pid] holds the path's cell domains when path_cands[pid] was
+    last computed, or None if it was set some other way.
+
+    heap orders paths by candidate count for first-fail branching. Entries
+    are pushed whenever a count changes (including on undo) and never
+    removed in place, so an entry is only valid while its count still
+    matches path_counts.
+
+    pool maps (L, key) to the shared candidate set of any path of length L
+    whose cells have domains key (see recompute_paths).
+
+    failed holds the signatures of propagated states whose subtree has no
+    solution, oldest first, so solve can cut off states it reaches again
+    through a different branch order.
+    """
+
+    DOMAIN = 0
+    PATH = 1
+
+    def __init__(self, domains, path_cands):
+        self.domains = domains
+        self.n_singletons = sum(1 for d in domains if d & (d - 1) == 0)
+        self.path_cands = path_cands
+        self.path_keys = [None] * len(path_cands)
+        self.path_counts = [0 if pc is None else popcount(pc) for pc in path_cands]
+        self.heap = [(cnt, pid) for pid, cnt in enumerate(self.path_counts) if cnt > 1]
+        heapq.heapify(self.heap)
+        self.trail = []
+        self.failed = {}
+        self.pool = {}
+        self._sig_format = f"{len(domains)}I"
+
+    def mark(self):
+        return len(self.trail)
+
+    def set_domain(self, i, v):
+        old = self.domains[i]
+        self.trail.append((self.DOMAIN, i, old))
+        self.domains[i] = v
+        self.n_singletons += (v & (v - 1) == 0) - (old & (old - 1) == 0)
+
+    def set_pc(self, pid, v, key=None, cnt=None):
+        old = (self.path_cands[pid], self.path_keys[pid], self.path_counts[pid])
+        self.trail.append((self.PATH, pid, old))
+        self.path_cands[pid] = v
+        self.path_keys[pid] = key
+        self._set_count(pid, popcount(v) if cnt is None else cnt)
+
+    def _set_count(self, pid, cnt):
+        if cnt != self.path_counts[pid]:
+            self.path_counts[pid] = cnt
+            if cnt > 1:
+                heapq.heappush(self.heap, (cnt, pid))
+
+    def undo(self, mark):
+        """Pop trail entries until its length is back to mark."""
+        trail = self.trail
+        while len(trail) > mark:
+            kind, idx, old = trail.pop()
+            if kind == self.DOMAIN:
+                cur = self.domains[idx]
+                self.domains[idx] = old
+                self.n_singletons += (old & (old - 1) == 0) - (cur & (cur - 1) == 0)
+            else:
+                self.path_cands[idx], self.path_keys[idx], cnt = old
+                self._set_count(idx, cnt)
+
+    def fewest_candidates(self):
+        """Path with fewest candidates (>1), or None."""
+        heap = self.heap
+        counts = self.path_counts
+        if len(heap) > HEAP_SLACK * len(counts):
+            heap[:] = [(cnt, pid) for pid, cnt in enumerate(counts) if cnt > 1]
+            heapq.heapify(heap)
+        while heap:
+            cnt, pid = heap[0]
+            if cnt == counts[pid]:
+                return pid
+            heapq.heappop(heap)  # stale: the path's count has changed since
+        return None
 
+    def solved(self):
+        """All cells are single letters."""
+        return self.n_singletons == len(self.domains)
 
-def propagate(domains, path_cands, paths, index, all_mask, n_cells):
+    def signature(self):
+        """
+        Exact key for the current state, valid once propagate has reached its
+        fixpoint: every path's candidates are then computed from its cells'
+        domains, so the domains alone determine path_cands.
+        """
+        return struct.pack(self._sig_format, *self.domains)
+
+    def add_failed(self, sig):
+        if len(self.failed) >= FAILED_LIMIT:
+            del self.failed[next(iter(self.failed))]
+        self.failed[sig] = None
+
+
+def propagate(state, paths, paths_of_cell, index, all_mask, letter_of_word, pids=None):
     """
     Tighten:
       - path candidates from cell domains
       - cell domains from path candidates
-    until stable
+    until stable, AC-3 style: starting from pids (default: every path), a
+    path is revisited only after one of its cells' domains shrinks.
     """
-    changed = True
-    while changed:
-        changed = False
-
-        # Update each path's candidate set from current cell domains
-        for pid, (cells, L) in enumerate(paths):
-            new_pc = compute_path_candidates(cells, L, domains, index, all_mask)
-            if new_pc == 0:
+    domains = state.domains
+    path_cands = state.path_cands
+    path_keys = state.path_keys
+    path_counts = state.path_counts
+
+    queue = deque(range(len(paths)) if pids is None else pids)
+    in_queue = [False] * len(paths)
+    for pid in queue:
+        in_queue[pid] = True
+
+    while queue:
+        # Update every queued path's candidate set from current cell domains
+        # first, so an emptied path fails the pass before any domain work
+        batch = list(queue)
+        queue.clear()
+        for pid in batch:
+            in_queue[pid] = False
+
+        tightened = []
+        for pid, key, new_pc in recompute_paths(batch, paths, domains, path_keys, state.pool, index, all_mask):
+            if new_pc is None:
                 return False
-            if new_pc != path_cands[pid]:
-                path_cands[pid] = new_pc
-                changed = True
-
-        # Update cell domains from path candidate sets
-        new_domains = [ALL] * n_cells
-        for pid, (cells, L) in enumerate(paths):
-            cands = path_cands[pid]
-            idxL = index[L]
-            for pos, cell in enumerate(cells):
-                new_domains[cell] &= possible_letters_at_pos(cands, idxL[pos])
-                if new_domains[cell] == 0:
+            # Domains only shrink between recomputes, so new_pc is a subset of
+            # the old candidates and differs from them exactly when smaller
+            cnt = popcount(new_pc)
+            if path_keys[pid] is None or cnt != path_counts[pid]:
+                tightened.append(pid)
+            state.set_pc(pid, new_pc, key, cnt)
+
+        # Update cell domains from the tightened paths, queueing the other
+        # paths through any cell that shrinks
+        for pid in tightened:
+            cells, L = paths[pid]
+            masks = possible_letters_by_pos(path_cands[pid], index[L], letter_of_word[L], GATHER_DIVISOR)
+            for cell, mask in zip(cells, masks):
+                nd = domains[cell] & mask
+                if nd == 0:
                     return False
-
-        # Intersect with existing domains
-        for i in range(n_cells):
-            nd = new_domains[i] & domains[i]
-            if nd == 0:
-                return False
-            if nd != domains[i]:
-                domains[i] = nd
-                changed = True
+                if nd != domains[cell]:
+                    state.set_domain(cell, nd)
+                    for other in paths_of_cell[cell]:
+                        if not in_queue[other] and other != pid:
+                            in_queue[other] = True
+                            queue.append(other)
 
     return True
 
 
-def solved(domains):
-    """All cells are single letters."""
-    for d in domains:
-        if d & (d - 1):
-            return False
-    return True
-
+def solve(state, paths, paths_of_cell, index, all_mask, letter_of_word, words_by_len, pids=None):
+    """DFS + propagate. On failure the caller undoes this call's writes."""
+    if not propagate(state, paths, paths_of_cell, index, all_mask, letter_of_word, pids):
+        return None
 
-def choose_branch_path(path_cands):
-    """Path with fewest candidates (>1)."""
-    best = None
-    best_cnt = 10**9
-    for pid, c in enumerate(path_cands):
-        cnt = bitcount(c)
-        if 1 < cnt < best_cnt:
-            best_cnt = cnt
-            best = pid
-    return best
+    domains = state.domains
+    path_cands = state.path_cands
 
+    if state.solved():
+        return domains
 
-def solve(domains, path_cands, paths, index, all_mask, n_cells, words_by_len):
-    """DFS + propagate."""
-    if not propagate(domains, path_cands, paths, index, all_mask, n_cells):
+    sig = state.signature()
+    if sig in state.failed:
         return None
 
-    if solved(domains):
-        return domains
-
-    pid = choose_branch_path(path_cands)
+    pid = state.fewest_candidates()
     if pid is None:
+        state.add_failed(sig)
         return None  # should be solved already, but just in case
 
     cells, L = paths[pid]
     words = words_by_len[L]
     candidates = path_cands[pid]
 
-    for wid in iter_bits(candidates):
+    for wid in iter_word_ids(candidates):
         w = words[wid]
 
-        d2 = domains[:]       # copy state
-        pc2 = path_cands[:]   # copy state
-        pc2[pid] = 1 << wid   # force that path to this word
+        mark = state.mark()
+        only = np.zeros_like(candidates)
+        only[wid >> 6] = 1 << (wid & 63)
+        state.set_pc(pid, only)  # force that path to this word
+        touched = {pid}
 
         ok = True
         for pos, cell in enumerate(cells):
             letter = ord(w[pos]) - 65
             mask = 1 << letter
-            if d2[cell] & mask == 0:
+            if domains[cell] & mask == 0:
                 ok = False
                 break
-            d2[cell] = mask
+            if domains[cell] != mask:
+                state.set_domain(cell, mask)
+                touched.update(paths_of_cell[cell])
 
-        if not ok:
-            continue
+        if ok:
+            res = solve(state, paths, paths_of_cell, index, all_mask, letter_of_word, words_by_len, touched)
+            if res is not None:
+                return res
 
-        res = solve(d2, pc2, paths, index, all_mask, n_cells, words_by_len)
-        if res is not None:
-            return res
+        state.undo(mark)
 
+    state.add_failed(sig)
     return None
 
 
@@ -240,7 +486,7 @@ def mask_to_letter(mask):
 def main():
     raw_paths, nrows, ncols, max_len = load_paths()
     words_by_len = load_dictionary(max_len)
-    index, all_mask = build_index(words_by_len)
+    index, all_mask, letter_of_word = build_index(words_by_len)
 
     # Convert coordinate paths to linear cell IDs
     paths = []
@@ -249,10 +495,21 @@ def main():
         paths.append((cell_ids, L))
 
     n_cells = nrows * ncols
+    paths_of_cell = [[] for _ in range(n_cells)]
+    for pid, (cell_ids, _) in enumerate(paths):
+        for cell in cell_ids:
+            paths_of_cell[cell].append(pid)
+
     domains = [ALL] * n_cells
-    path_cands = [all_mask.get(L, 0) for (_, L) in paths]
+    path_cands = [all_mask.get(L) for (_, L) in paths]
+
+    # A path length with no dictionary words can never be filled
+    if any(pc is None for pc in path_cands):
+        print("No solution found.")
+        return
 
-    sol = solve(domains, path_cands, paths, index, all_mask, n_cells, words_by_len)
+    state = SearchState(domains, path_cands)
+    sol = solve(state, paths, paths_of_cell, index, all_mask, letter_of_word, words_by_len)
 
     if sol is None:
         print("No solution found.")
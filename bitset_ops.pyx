@@ -0,0 +1,158 @@
+# cython: language_level=3, boundscheck=False, wraparound=False
+"""
+Compiled bitset kernels for better_board_reconstruct.py.
+
+Build in place with:
+
+    python setup.py build_ext --inplace
+
+Bitsets are C-contiguous uint64 word arrays; word ID wid lives at bit
+(wid & 63) of word (wid >> 6).
+"""
+from libc.stdint cimport uint8_t, uint32_t, uint64_t
+from libc.stdlib cimport calloc, free
+
+
+cdef extern from *:
+    """
+    #if defined(__GNUC__) || defined(__clang__)
+    #define bb_ctz64(x) __builtin_ctzll(x)
+    #define bb_popcount64(x) __builtin_popcountll(x)
+    #else
+    /* Compilers without the GCC builtins (e.g. MSVC): de Bruijn bit scan.
+       x & -x isolates the lowest 1-bit, and multiplying by the de Bruijn
+       constant leaves a distinct 6-bit pattern in the top bits for each of
+       the 64 positions. */
+    static const int bb_debruijn_index64[64] = {
+        0, 1, 48, 2, 57, 49, 28, 3, 61, 58, 50, 42, 38, 29, 17, 4,
+        62, 55, 59, 36, 53, 51, 43, 22, 45, 39, 33, 30, 24, 18, 12, 5,
+        63, 47, 56, 27, 60, 41, 37, 16, 54, 35, 52, 21, 44, 32, 23, 11,
+        46, 26, 40, 15, 34, 20, 31, 10, 25, 14, 19, 9, 13, 8, 7, 6
+    };
+    static CYTHON_INLINE int bb_ctz64(unsigned long long x) {
+        return bb_debruijn_index64[((x & (0ULL - x)) * 0x03f79d71b4cb0a89ULL) >> 58];
+    }
+    static CYTHON_INLINE int bb_popcount64(unsigned long long x) {
+        x = x - ((x >> 1) & 0x5555555555555555ULL);
+        x = (x & 0x3333333333333333ULL) + ((x >> 2) & 0x3333333333333333ULL);
+        x = (x + (x >> 4)) & 0x0f0f0f0f0f0f0f0fULL;
+        return (int)((x * 0x0101010101010101ULL) >> 56);
+    }
+    #endif
+    """
+    # Lowest 1-bit index / number of 1-bits; x must be nonzero for bb_ctz64
+    int bb_ctz64(unsigned long long x) nogil
+    int bb_popcount64(unsigned long long x) nogil
+
+
+cdef inline bint and_into(uint64_t* dst, const uint64_t* row, int nwords) noexcept nogil:
+    """dst &= row, word by word; return whether any bit of dst is left."""
+    cdef int w
+    cdef uint64_t acc = 0
+    for w in range(nwords):
+        dst[w] &= row[w]
+        acc |= dst[w]
+    return acc != 0
+
+
+cdef int next_bit(uint64_t* words, int nwords, int* word_idx) noexcept nogil:
+    """Clear and return the lowest 1-bit at or after words[word_idx[0]], or -1."""
+    cdef int wi = word_idx[0]
+    cdef uint64_t x
+    while wi < nwords:
+        x = words[wi]
+        if x:
+            words[wi] = x & (x - 1)
+            word_idx[0] = wi
+            return (wi << 6) + bb_ctz64(x)
+        wi += 1
+    word_idx[0] = wi
+    return -1
+
+
+def iter_word_ids(words):
+    """Yield indices of 1-bits in a uint64 word array."""
+    cdef uint64_t[::1] scratch = words.copy()
+    cdef int nwords = scratch.shape[0]
+    cdef int word_idx = 0
+    cdef int wid
+    if nwords == 0:
+        return
+    while True:
+        wid = next_bit(&scratch[0], nwords, &word_idx)
+        if wid < 0:
+            return
+        yield wid
+
+
+cpdef Py_ssize_t popcount(const uint64_t[::1] words):
+    """Number of 1-bits in a uint64 word array."""
+    cdef Py_ssize_t count = 0
+    cdef Py_ssize_t w
+    for w in range(words.shape[0]):
+        count += bb_popcount64(words[w])
+    return count
+
+
+cpdef object compute_path_candidates(path_cells, int L, domains, index, all_mask):
+    """Return bitset of candidate word IDs for this path, or None if empty."""
+    if L not in index:
+        return None
+
+    idxL = index[L]
+    out = all_mask[L].copy()
+    cdef uint64_t[::1] cand = out
+    cdef int nwords = cand.shape[0]
+    cdef const uint64_t[::1] row
+    cdef bint empty
+    cdef int pos = 0
+
+    for cell in path_cells:
+        # PosTable.allowed_words ORs (and caches) the allowed letters' rows
+        row = idxL[pos].allowed_words(domains[cell])
+        with nogil:
+            empty = not and_into(&cand[0], &row[0], nwords)
+        if empty:
+            return None
+        pos += 1
+
+    return out
+
+
+cpdef list possible_letters_by_pos(const uint64_t[::1] cands, idxL, const uint8_t[:, :] letters, int gather_divisor):
+    """Which letters appear among candidate words at each position of length L?"""
+    cdef int L = letters.shape[0]
+    cdef int nwords = cands.shape[0]
+    cdef uint32_t* masks = <uint32_t*>calloc(L, sizeof(uint32_t))
+    cdef const uint64_t[:, ::1] letter_bits
+    cdef uint64_t x
+    cdef int pos, li, wi, w, wid
+    if masks == NULL:
+        raise MemoryError()
+
+    try:
+        if popcount(cands) <= letters.shape[1] // gather_divisor:
+            # Sparse: read each candidate's letters from the transposed table
+            with nogil:
+                for wi in range(nwords):
+                    x = cands[wi]
+                    while x:
+                        wid = (wi << 6) + bb_ctz64(x)
+                        x &= x - 1
+                        for pos in range(L):
+                            li = letters[pos, wid]
+                            if li < 26:
+                                masks[pos] |= 1u << li
+        else:
+            # Dense: test each letter's word-bitset against the candidates
+            for pos in range(L):
+                letter_bits = idxL[pos].letter_bits
+                with nogil:
+                    for li in range(26):
+                        for w in range(nwords):
+                            if cands[w] & letter_bits[li, w]:
+                                masks[pos] |= 1u << li
+                                break
+        return [masks[pos] for pos in range(L)]
+    finally:
+        free(masks)
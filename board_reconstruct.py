@@ -1,6 +1,8 @@
 import json
 import os
 from collections import defaultdict
+
+import numpy as np
 from ortools.sat.python import cp_model
 
 class BoggleBoardReconstructor:
@@ -15,7 +17,7 @@ class BoggleBoardReconstructor:
         self.words_by_length = defaultdict(set)
         self.valid_words = self.load_dictionary()
         self.board = [[' ' for _ in range(board_size)] for _ in range(board_size)]
-        self.letter_options = defaultdict(set)
+        self.letter_options = defaultdict(int)  # (r, c) -> 26-bit mask of allowed letters
         self.build_constraints()
     
     def load_word_paths(self):
@@ -36,19 +38,42 @@ class BoggleBoardReconstructor:
             self.words_by_length[len(word)].add(word)
         return words
     
+    def position_masks(self, length):
+        """Returns, per position, the mask of letters used by words of this length."""
+        masks = []
+        for pos in range(length):
+            mask = 0
+            for letter in {word[pos] for word in self.words_by_length[length]}:
+                index = ord(letter) - ord('A')
+                if 0 <= index < 26:
+                    mask |= 1 << index
+            masks.append(mask)
+        return masks
+    
     def build_constraints(self):
         """Prepares letter constraints based on word paths."""
+        masks_by_length = {}
         for path in self.word_paths:
             length = len(path)
             if length in self.words_by_length:
-                for word in self.words_by_length[length]:
-                    for (coord, letter) in zip(path, word):
-                        self.letter_options[tuple(coord)].add(ord(letter) - ord('A'))
+                if length not in masks_by_length:
+                    masks_by_length[length] = self.position_masks(length)
+                for coord, mask in zip(path, masks_by_length[length]):
+                    self.letter_options[tuple(coord)] |= mask
         
         for r in range(self.board_size):
             for c in range(self.board_size):
                 if (r, c) not in self.letter_options:
-                    self.letter_options[(r, c)] = set(range(26))
+                    self.letter_options[(r, c)] = (1 << 26) - 1
+    
+    def encode_words(self, length):
+        """Encodes words of this length as rows of letter indices (A=0) for AddAllowedAssignments."""
+        words = list(self.words_by_length[length])
+        if not words:
+            return []
+        # UTF-32 gives one code point per character, matching ord() for any letter
+        codes = np.frombuffer("".join(words).encode("utf-32-le"), dtype=np.uint32)
+        return (codes.reshape(-1, length).astype(np.int64) - ord('A')).tolist()
     
     def solve_with_csp(self):
         """Solves the Boggle board using constraint programming (CSP)."""
@@ -57,16 +82,18 @@ class BoggleBoardReconstructor:
         
         for r in range(self.board_size):
             for c in range(self.board_size):
-                domain = list(self.letter_options[(r, c)])
+                mask = self.letter_options[(r, c)]
+                domain = [i for i in range(26) if mask >> i & 1]
                 variables[(r, c)] = model.NewIntVarFromDomain(cp_model.Domain.FromValues(domain), f"cell_{r}_{c}")
         
+        encoded_by_length = {}
         for path in self.word_paths:
             length = len(path)
             if length in self.words_by_length:
-                possible_words = [word for word in self.words_by_length[length]]
+                if length not in encoded_by_length:
+                    encoded_by_length[length] = self.encode_words(length)
                 word_vars = [variables[(r, c)] for r, c in path]
-                encoded_words = [[ord(letter) - ord('A') for letter in word] for word in possible_words]
-                model.AddAllowedAssignments(word_vars, encoded_words)
+                model.AddAllowedAssignments(word_vars, encoded_by_length[length])
         
         solver = cp_model.CpSolver()
         status = solver.Solve(model)
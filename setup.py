@@ -0,0 +1,5 @@
+"""Builds the optional bitset_ops extension: python setup.py build_ext --inplace"""
+from Cython.Build import cythonize
+from setuptools import setup
+
+setup(ext_modules=cythonize("bitset_ops.pyx"))
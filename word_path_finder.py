@@ -1,39 +1,55 @@
 import json
+from array import array
 from collections import defaultdict
 
-class TrieNode:
-    """Node in a Trie data structure."""
-    def __init__(self):
-        self.children = {}
-        self.is_end_of_word = False
+# next_arr slots appended for each new Trie node
+EMPTY_NODE = array('i', [0] * 26)
 
 class Trie:
-    """Trie (Prefix Tree) for storing valid words."""
+    """Trie (Prefix Tree) for storing valid A-Z words, kept in flat arrays.
+
+    Nodes are ints with the root at 0. The child of node for letter index li
+    (0-25) is next_arr[node * 26 + li], where 0 means no child since the root
+    is never a child, and is_end[node] marks the end of a word.
+    """
     def __init__(self):
-        self.root = TrieNode()
+        self.root = 0
+        self.next_arr = array('i', [0] * 26)
+        self.is_end = bytearray(1)
     
     def insert(self, word: str):
-        """Inserts a word into the Trie."""
+        """Inserts a word into the Trie, skipping words with non A-Z letters."""
+        codes = [ord(letter) - 65 for letter in word]
+        if not all(0 <= li < 26 for li in codes):
+            return
+        next_arr = self.next_arr
         node = self.root
-        for letter in word:
-            if letter not in node.children:
-                node.children[letter] = TrieNode()
-            node = node.children[letter]
-        node.is_end_of_word = True
+        for li in codes:
+            child = next_arr[node * 26 + li]
+            if child == 0:
+                child = len(self.is_end)
+                next_arr.extend(EMPTY_NODE)
+                self.is_end.append(0)
+                next_arr[node * 26 + li] = child
+            node = child
+        self.is_end[node] = 1
     
     def search_prefix(self, prefix: str):
-        """Searches for a prefix in the Trie."""
+        """Searches for a prefix in the Trie, returning its node or None."""
         node = self.root
         for letter in prefix:
-            if letter not in node.children:
+            li = ord(letter) - 65
+            if not 0 <= li < 26:
+                return None
+            node = self.next_arr[node * 26 + li]
+            if node == 0:
                 return None
-            node = node.children[letter]
         return node
     
     def is_word(self, word: str) -> bool:
         """Checks if a word exists in the Trie."""
         node = self.search_prefix(word)
-        return node is not None and node.is_end_of_word
+        return node is not None and self.is_end[node] == 1
     
     def starts_with(self, prefix: str) -> bool:
         """Checks if a prefix exists in the Trie."""
@@ -47,9 +63,16 @@ class BoggleSolver:
     def __init__(self, board: list[list[str]], dictionary: set[str]):
         self.board = board
         self.n = len(board)
+        # Letter index (0-25) of each cell r * n + c, or -1 if not a single A-Z letter
+        self.codes = [
+            ord(letter) - 65 if len(letter) == 1 and "A" <= letter <= "Z" else -1
+            for row in board for letter in row
+        ]
         self.trie = Trie()
         self.load_dictionary(dictionary)
         self.found_paths = {}
+        self._path = []
+        self._visited = bytearray(self.n * self.n)
     
     def load_dictionary(self, dictionary: set[str]):
         """Loads words longer than two letters into the Trie."""
@@ -57,33 +80,50 @@ class BoggleSolver:
             if len(word) > 2:
                 self.trie.insert(word)
     
-    def is_valid(self, r: int, c: int, visited: set) -> bool:
+    def is_valid(self, r: int, c: int, visited: bytearray) -> bool:
         """Checks if a position is within bounds and not visited."""
-        return 0 <= r < self.n and 0 <= c < self.n and (r, c) not in visited
+        return 0 <= r < self.n and 0 <= c < self.n and not visited[r * self.n + c]
     
-    def dfs(self, r: int, c: int, node: TrieNode, word: str, path: list):
-        """Performs DFS to find all valid words following Boggle adjacency rules."""
-        letter = self.board[r][c]
-        if letter not in node.children:
-            return
-        
-        node = node.children[letter]
-        word += letter
-        path.append((r, c))
+    def dfs(self, r: int, c: int, node: int):
+        """Performs DFS to find all valid words following Boggle adjacency rules.
+
+        (r, c) extends the current path and its letter has already led to node.
+        self._path holds cells as r * n + c and self._visited flags the same
+        cells; both are shared across the whole search and restored before
+        returning.
+        """
+        cell = r * self.n + c
+        path = self._path
+        visited = self._visited
+        path.append(cell)
+        visited[cell] = 1
         
-        if node.is_end_of_word and word not in self.found_paths:
-            self.found_paths[word] = list(path)
+        if self.trie.is_end[node]:
+            word = "".join([self.board[p // self.n][p % self.n] for p in path])
+            if word not in self.found_paths:
+                self.found_paths[word] = [divmod(p, self.n) for p in path]
         
+        next_arr = self.trie.next_arr
         for dr, dc in DIRECTIONS:
             nr, nc = r + dr, c + dc
-            if self.is_valid(nr, nc, path):
-                self.dfs(nr, nc, node, word, path[:])
+            if self.is_valid(nr, nc, visited):
+                li = self.codes[nr * self.n + nc]
+                if li >= 0 and next_arr[node * 26 + li]:
+                    self.dfs(nr, nc, next_arr[node * 26 + li])
+        
+        path.pop()
+        visited[cell] = 0
     
     def find_words(self):
         """Finds all words in the Boggle board."""
+        self._path = []
+        self._visited = bytearray(self.n * self.n)
+        root = self.trie.root
         for r in range(self.n):
             for c in range(self.n):
-                self.dfs(r, c, self.trie.root, "", [])
+                li = self.codes[r * self.n + c]
+                if li >= 0 and self.trie.next_arr[root * 26 + li]:
+                    self.dfs(r, c, self.trie.next_arr[root * 26 + li])
     
     def save_paths(self, filename="word_paths.json"):
         """Saves found words' paths and lengths to a file."""